@@ -11,10 +11,30 @@ extern "C" {
 #include <cstdlib>
 #include <unistd.h>
 #include <algorithm>
+#include <cmath>
+#include <thread>
+#include <atomic>
+#include <fstream>
+
+// Samples per Silero VAD window at 16 kHz
+static constexpr int   VAD_WINDOW_SAMPLES      = 512;
+// Scan chunk length: ~30s rounded down to whole VAD windows, so no window gets
+// zero-padded at a chunk boundary
+static constexpr int   CHUNK_SIZE_SAMPLES      = (30 * WHISPER_SAMPLE_RATE / VAD_WINDOW_SAMPLES) * VAD_WINDOW_SAMPLES;
+// Segment timestamps are reported in centiseconds
+static constexpr float CENTISECONDS_TO_SECONDS = 0.01f;
+static constexpr float SAMPLES_TO_SECONDS      = 1.0f / WHISPER_SAMPLE_RATE;
+// Silence kept around the detected speech, in seconds
+static constexpr float SPEECH_PADDING_SECONDS  = 0.5f;
+// Peak amplitude at or below which audio is treated as silent without running
+// the VAD: -60 dBFS, well under any audible speech
+static constexpr float SILENCE_PEAK_LEVEL      = 1e-3f;
 
 void whisper_log_callback(ggml_log_level level, const char * text, void * user_data) {
     (void)user_data;
-    static ggml_log_level last_level = GGML_LOG_LEVEL_NONE;
+    // per thread: both VAD scans can log at once, and a continuation belongs
+    // to the level last set by the same thread
+    static thread_local ggml_log_level last_level = GGML_LOG_LEVEL_NONE;
     if (level != GGML_LOG_LEVEL_CONT) {
         last_level = level;
     }
@@ -23,167 +43,260 @@ void whisper_log_callback(ggml_log_level level, const char * text, void * user_d
     }
 }
 
-int main(int argc, char ** argv) {
-    whisper_log_set(whisper_log_callback, nullptr);
-    av_log_set_level(AV_LOG_ERROR);
-
-    std::string audio_file = "";
-    std::string output_file = "";
-    std::string model_path = "/home/daniel/archivos/ggml-silero-v6.2.0.bin";
-    bool trim_start_requested = false;
-    bool trim_end_requested = false;
-    bool output_specified = false;
-
-    for (int i = 1; i < argc; ++i) {
-        std::string arg = argv[i];
-        if (arg == "--output" && i + 1 < argc) {
-            output_file = argv[++i];
-            output_specified = true;
-        } else if (arg == "--trim-start" || arg == "-s") {
-            trim_start_requested = true;
-        } else if (arg == "--trim-end" || arg == "-e") {
-            trim_end_requested = true;
-        } else if (arg == "--replace" || arg == "-i") {
-            output_specified = false;
-        } else if (arg == "--model" && i + 1 < argc) {
-            model_path = argv[++i];
-        } else if (arg[0] != '-') {
-            if (audio_file.empty()) {
-                audio_file = arg;
-            } else {
-                fprintf(stderr, "Error: Multiple audio files specified: %s and %s\n", audio_file.c_str(), arg.c_str());
-                return 1;
-            }
-        } else {
-            fprintf(stderr, "Error: Unknown option %s\n", arg.c_str());
-            return 1;
-        }
+// Run the VAD over a block of samples and only build segments when at least
+// one window crosses the speech threshold; silent blocks never get that far.
+static struct whisper_vad_segments * detect_speech_segments(struct whisper_vad_context * vctx, const struct whisper_vad_params & params, const float * samples, int n_samples) {
+    if (!whisper_vad_detect_speech(vctx, samples, n_samples)) {
+        return nullptr;
     }
 
-    if (audio_file.empty()) {
-        fprintf(stderr, "Usage: %s <audio_file> [options]\n", argv[0]);
-        fprintf(stderr, "\nOptions:\n");
-        fprintf(stderr, "  --output <file>    Output file path (default: overwrites input file)\n");
-        fprintf(stderr, "  --trim-start, -s   Trim only the silence at the beginning\n");
-        fprintf(stderr, "  --trim-end, -e     Trim only the silence at the end\n");
-        fprintf(stderr, "  --model <file>     Path to Silero VAD model\n");
-        return 1;
+    const int n_probs = whisper_vad_n_probs(vctx);
+    const float * probs = whisper_vad_probs(vctx);
+    if (std::none_of(probs, probs + n_probs, [&](float p) { return p >= params.threshold; })) {
+        return nullptr;
     }
 
-    if (const char* env_model = getenv("WHISPER_VAD_MODEL")) {
-        model_path = env_model;
+    return whisper_vad_segments_from_probs(vctx, params);
+}
+
+// Coarse pass ahead of the VAD: find the span from the first to the last window
+// whose peak amplitude exceeds level. Everything outside it is too quiet to be
+// speech, so the model does not need to look at it.
+static void find_audible_span(const std::vector<float> & pcmf32, int window, float level, int & begin, int & end) {
+    auto audible = [level](float x) { return std::fabs(x) > level; };
+
+    auto first = std::find_if(pcmf32.begin(), pcmf32.end(), audible);
+    if (first == pcmf32.end()) {
+        begin = end = 0;
+        return;
     }
+    auto last = std::find_if(pcmf32.rbegin(), pcmf32.rend(), audible);
 
-    bool replace_input = !output_specified;
+    const int n = (int)pcmf32.size();
+    begin = (int)(first - pcmf32.begin()) / window * window;
+    end = std::min(n, ((n - 1 - (int)(last - pcmf32.rbegin())) / window + 1) * window);
+}
 
-    if (replace_input) {
-        char tmp_template[] = "/tmp/detect-speech-XXXXXX.opus";
-        int fd = mkstemps(tmp_template, 5);
-        if (fd == -1) {
-            fprintf(stderr, "Error: Failed to create temporary file.\n");
-            return 1;
+// Pair of VAD contexts for running the forward and backward scans at once.
+// They are only loaded when a long input first needs them, since short inputs
+// are covered by a single pass on the main context.
+struct vad_scan_pair {
+    struct whisper_vad_context * vctx = nullptr; // main context
+    std::string model_path;
+    struct whisper_vad_context_params vparams;   // main context params
+    struct whisper_vad_context * vctx_start = nullptr;
+    struct whisper_vad_context * vctx_end = nullptr;
+    bool tried = false;
+};
+
+// Load the pair on first use, splitting the thread budget between both sides.
+// With a single thread the forward scan reuses the main context. Returns false,
+// leaving the scans to run in turn on the main context, if loading fails.
+static bool vad_scan_pair_init(struct vad_scan_pair & pair) {
+    if (!pair.tried) {
+        pair.tried = true;
+
+        const int n_threads = pair.vparams.n_threads;
+        struct whisper_vad_context_params start_vparams = pair.vparams;
+        struct whisper_vad_context_params end_vparams = pair.vparams;
+        start_vparams.n_threads = n_threads - n_threads / 2;
+        end_vparams.n_threads = std::max(1, n_threads / 2);
+
+        pair.vctx_start = start_vparams.n_threads == n_threads ? pair.vctx : whisper_vad_init_from_file_with_params(pair.model_path.c_str(), start_vparams);
+        if (pair.vctx_start) {
+            pair.vctx_end = whisper_vad_init_from_file_with_params(pair.model_path.c_str(), end_vparams);
+        }
+        if (pair.vctx_end == nullptr) {
+            if (pair.vctx_start && pair.vctx_start != pair.vctx) {
+                whisper_vad_free(pair.vctx_start);
+            }
+            pair.vctx_start = nullptr;
         }
-        close(fd);
-        output_file = tmp_template;
     }
 
-    bool call_trim_start = trim_start_requested || (!trim_start_requested && !trim_end_requested);
-    bool call_trim_end = trim_end_requested || (!trim_start_requested && !trim_end_requested);
+    return pair.vctx_start && pair.vctx_end;
+}
 
+static void vad_scan_pair_free(struct vad_scan_pair & pair) {
+    if (pair.vctx_end) {
+        whisper_vad_free(pair.vctx_end);
+    }
+    if (pair.vctx_start && pair.vctx_start != pair.vctx) {
+        whisper_vad_free(pair.vctx_start);
+    }
+    pair.vctx_start = pair.vctx_end = nullptr;
+}
+
+// Detect speech in a single audio file and trim the surrounding silence with ffmpeg.
+// pcmf32 is only scratch space for the decoded samples, shared across files.
+// scan_pair supplies the contexts for scanning both ends concurrently; vctx
+// serves everything else.
+static int process_file(struct whisper_vad_context * vctx, struct vad_scan_pair & scan_pair, const struct whisper_vad_params & vad_params, std::vector<float> & pcmf32, const std::string & audio_file, std::string output_file, bool replace_input, bool call_trim_start, bool call_trim_end) {
     // Load audio data
-    std::vector<float> pcmf32;
     std::vector<std::vector<float>> pcmf32s;
     if (!read_audio_data(audio_file, pcmf32, pcmf32s, false)) {
         fprintf(stderr, "Error: Failed to read audio data from %s\n", audio_file.c_str());
         return 1;
     }
 
-    // Initialize VAD context
-    struct whisper_vad_context_params vparams = whisper_vad_default_context_params();
-    
-    struct whisper_vad_context * vctx = whisper_vad_init_from_file_with_params(model_path.c_str(), vparams);
-    if (vctx == nullptr) {
-        fprintf(stderr, "Error: Failed to initialize VAD context using model from %s\n", model_path.c_str());
-        return 1;
-    }
-
-    // Detect speech segments
-    struct whisper_vad_params vad_params = whisper_vad_default_params();
-
-    float total_duration_seconds = (float)pcmf32.size() / (float)WHISPER_SAMPLE_RATE;
+    float total_duration_seconds = (float)pcmf32.size() * SAMPLES_TO_SECONDS;
     float final_start_seconds = 0.0f;
     float final_end_seconds = total_duration_seconds;
     bool speech_detected = false;
 
-    // Process in 30s chunks to find start and end
-    const int chunk_size_samples = 30 * WHISPER_SAMPLE_RATE;
+    // Only the span between the first and last samples above the silence level
+    // can hold speech, so leading and trailing near-silence never reaches the VAD
+    int audible_begin = 0;
+    int audible_end = 0;
+    find_audible_span(pcmf32, VAD_WINDOW_SAMPLES, SILENCE_PEAK_LEVEL, audible_begin, audible_end);
+    if (audible_begin >= audible_end) {
+        fprintf(stderr, "%s: No speech detected. Not creating an output file.\n", audio_file.c_str());
+        return 0;
+    }
+    const float audible_begin_seconds = (float)audible_begin * SAMPLES_TO_SECONDS;
 
-    if (call_trim_start) {
-        for (int i = 0; i < (int)pcmf32.size(); i += chunk_size_samples) {
-            int n_samples = std::min(chunk_size_samples, (int)pcmf32.size() - i);
-            struct whisper_vad_segments * segments = whisper_vad_segments_from_samples(vctx, vad_params, pcmf32.data() + i, n_samples);
+    // Inputs of up to two chunks are covered by a single VAD pass: the start
+    // and end scans would overlap there and run the model on the same samples twice
+    const bool single_pass = audible_end - audible_begin <= 2 * CHUNK_SIZE_SAMPLES;
+
+    if (single_pass) {
+        struct whisper_vad_segments * segments = detect_speech_segments(vctx, vad_params, pcmf32.data() + audible_begin, audible_end - audible_begin);
+        if (segments) {
+            int n_seg = whisper_vad_segments_n_segments(segments);
+            if (n_seg > 0) {
+                if (call_trim_start) {
+                    final_start_seconds = std::max(0.0f, audible_begin_seconds + whisper_vad_segments_get_segment_t0(segments, 0) * CENTISECONDS_TO_SECONDS - SPEECH_PADDING_SECONDS);
+                }
+                if (call_trim_end) {
+                    final_end_seconds = std::min(total_duration_seconds, audible_begin_seconds + whisper_vad_segments_get_segment_t1(segments, n_seg - 1) * CENTISECONDS_TO_SECONDS + SPEECH_PADDING_SECONDS);
+                }
+                speech_detected = true;
+            }
+            whisper_vad_free_segments(segments);
+        }
+    }
+
+    // The forward and backward scans publish how far they got so that, when
+    // they run concurrently, each one stops where the other has already looked
+    std::atomic<int> start_scanned{audible_begin};
+    std::atomic<int> start_found_sample{-1};
+    // Once the forward scan finds speech it also keeps where the last segment of
+    // that chunk ends, so the backward scan never has to run the VAD over it again
+    std::atomic<int> start_chunk_end{-1};
+    float start_chunk_speech_end_seconds = 0.0f;
+    std::atomic<int> end_scanned{audible_end};
+    bool start_found = false;
+    bool end_found = false;
+
+    auto scan_start = [&](struct whisper_vad_context * ctx) {
+        for (int i = audible_begin; i < audible_end; i += CHUNK_SIZE_SAMPLES) {
+            if (i >= end_scanned) {
+                break;
+            }
+            int n_samples = std::min(CHUNK_SIZE_SAMPLES, audible_end - i);
+            struct whisper_vad_segments * segments = detect_speech_segments(ctx, vad_params, pcmf32.data() + i, n_samples);
             if (segments) {
-                if (whisper_vad_segments_n_segments(segments) > 0) {
-                    final_start_seconds = (float)i / (float)WHISPER_SAMPLE_RATE + whisper_vad_segments_get_segment_t0(segments, 0) * 0.01f;
-                    final_start_seconds = std::max(0.0f, final_start_seconds - 0.5f);
-                    speech_detected = true;
+                int n_seg = whisper_vad_segments_n_segments(segments);
+                if (n_seg > 0) {
+                    final_start_seconds = (float)i * SAMPLES_TO_SECONDS + whisper_vad_segments_get_segment_t0(segments, 0) * CENTISECONDS_TO_SECONDS;
+                    final_start_seconds = std::max(0.0f, final_start_seconds - SPEECH_PADDING_SECONDS);
+                    start_chunk_speech_end_seconds = (float)i * SAMPLES_TO_SECONDS + whisper_vad_segments_get_segment_t1(segments, n_seg - 1) * CENTISECONDS_TO_SECONDS;
+                    start_chunk_end = i + n_samples;
+                    start_found_sample = (int)(final_start_seconds * WHISPER_SAMPLE_RATE);
+                    start_found = true;
                     whisper_vad_free_segments(segments);
                     break;
                 }
                 whisper_vad_free_segments(segments);
             }
+            start_scanned = i + n_samples;
         }
-    }
+    };
 
-    if (call_trim_end && (speech_detected || !call_trim_start)) {
-        bool end_found = false;
-        for (int i = (int)pcmf32.size(); i > 0; i -= chunk_size_samples) {
-            int start_sample = std::max(0, i - chunk_size_samples);
+    auto scan_end = [&](struct whisper_vad_context * ctx) {
+        for (int i = audible_end; i > audible_begin; i -= CHUNK_SIZE_SAMPLES) {
+            if (start_found_sample < 0 && i <= start_scanned) {
+                break;
+            }
+            if (start_chunk_end >= 0 && i <= start_chunk_end) {
+                // everything after i is silent, so the last speech is the forward scan's
+                final_end_seconds = std::min(total_duration_seconds, start_chunk_speech_end_seconds + SPEECH_PADDING_SECONDS);
+                end_found = true;
+                break;
+            }
+            int start_sample = std::max(audible_begin, i - CHUNK_SIZE_SAMPLES);
             int n_samples = i - start_sample;
-            struct whisper_vad_segments * segments = whisper_vad_segments_from_samples(vctx, vad_params, pcmf32.data() + start_sample, n_samples);
+            struct whisper_vad_segments * segments = detect_speech_segments(ctx, vad_params, pcmf32.data() + start_sample, n_samples);
             if (segments) {
                 int n_seg = whisper_vad_segments_n_segments(segments);
                 if (n_seg > 0) {
-                    final_end_seconds = (float)start_sample / (float)WHISPER_SAMPLE_RATE + whisper_vad_segments_get_segment_t1(segments, n_seg - 1) * 0.01f;
-                    final_end_seconds = std::min(total_duration_seconds, final_end_seconds + 0.5f);
-                    speech_detected = true;
+                    final_end_seconds = (float)start_sample * SAMPLES_TO_SECONDS + whisper_vad_segments_get_segment_t1(segments, n_seg - 1) * CENTISECONDS_TO_SECONDS;
+                    final_end_seconds = std::min(total_duration_seconds, final_end_seconds + SPEECH_PADDING_SECONDS);
                     end_found = true;
                     whisper_vad_free_segments(segments);
                     break;
                 }
                 whisper_vad_free_segments(segments);
             }
-            if (call_trim_start && start_sample <= (int)(final_start_seconds * WHISPER_SAMPLE_RATE)) {
+            end_scanned = start_sample;
+            if (start_found_sample >= 0 && start_sample <= start_found_sample) {
                 break;
             }
         }
-    }
+    };
 
-    whisper_vad_free(vctx);
+    if (!single_pass) {
+        if (call_trim_start && call_trim_end && vad_scan_pair_init(scan_pair)) {
+            // Long inputs scan from both ends at once, each side on its own VAD context
+            std::thread end_thread(scan_end, scan_pair.vctx_end);
+            scan_start(scan_pair.vctx_start);
+            end_thread.join();
+        } else {
+            if (call_trim_start) {
+                scan_start(vctx);
+            }
+            if (call_trim_end && (start_found || !call_trim_start)) {
+                scan_end(vctx);
+            }
+        }
+        speech_detected = start_found || end_found;
+    }
 
     if (!speech_detected) {
-        fprintf(stderr, "No speech detected. Not creating an output file.\n");
+        fprintf(stderr, "%s: No speech detected. Not creating an output file.\n", audio_file.c_str());
         return 0;
     }
 
     if (final_start_seconds <= 0.01f && final_end_seconds >= total_duration_seconds - 0.01f) {
-        fprintf(stderr, "No significant silence detected. Not creating an output file.\n");
-        if (replace_input) {
-            remove(output_file.c_str());
-        }
+        fprintf(stderr, "%s: No significant silence detected. Not creating an output file.\n", audio_file.c_str());
         return 0;
     }
 
+    // The temporary output only exists once there is something to write to it
+    if (replace_input) {
+        char tmp_template[] = "/tmp/detect-speech-XXXXXX.opus";
+        int fd = mkstemps(tmp_template, 5);
+        if (fd == -1) {
+            fprintf(stderr, "Error: Failed to create temporary file.\n");
+            return 1;
+        }
+        close(fd);
+        output_file = tmp_template;
+    }
+
     // FFmpeg command construction
-    // We use -ss before -i for faster seeking if it's a long file
+    // -ss goes before -i so ffmpeg seeks the input instead of demuxing everything
+    // up to the start point, which makes -to relative to -ss. With -c copy the cut
+    // snaps to packet boundaries; every audio packet is a keyframe, so this costs
+    // at most one packet (~20 ms for opus), well inside the 0.5s padding above.
     std::string trim_cmd = "ffmpeg -hide_banner -loglevel error -nostdin -y -ss " + std::to_string(final_start_seconds) + " -i \"" + audio_file + "\"";
     
     if (final_end_seconds < total_duration_seconds) {
         trim_cmd += " -to " + std::to_string(final_end_seconds - final_start_seconds);
-        fprintf(stderr, "Detected speech from %.3f to %.3f (duration: %.3f).\n", 
-                final_start_seconds, final_end_seconds, final_end_seconds - final_start_seconds);
+        fprintf(stderr, "%s: Detected speech from %.3f to %.3f (duration: %.3f).\n",
+                audio_file.c_str(), final_start_seconds, final_end_seconds, final_end_seconds - final_start_seconds);
     } else {
-        fprintf(stderr, "Detected speech from %.3f.\n", final_start_seconds);
+        fprintf(stderr, "%s: Detected speech from %.3f.\n", audio_file.c_str(), final_start_seconds);
     }
 
     trim_cmd += " -c copy \"" + output_file + "\"";
@@ -209,3 +322,144 @@ int main(int argc, char ** argv) {
     return 0;
 }
 
+int main(int argc, char ** argv) {
+    whisper_log_set(whisper_log_callback, nullptr);
+    av_log_set_level(AV_LOG_ERROR);
+
+    std::string audio_file = "";
+    std::string output_file = "";
+    std::string model_path = "/home/daniel/archivos/ggml-silero-v6.2.0.bin";
+    bool trim_start_requested = false;
+    bool trim_end_requested = false;
+    std::string batch_file = "";
+    bool output_specified = false;
+    // The Silero graph for a single window is tiny, so extra threads cost more
+    // in synchronisation than they save in compute
+    int n_threads = 1;
+    bool use_gpu = false;
+    int gpu_device = 0;
+    float threshold = whisper_vad_default_params().threshold;
+
+    for (int i = 1; i < argc; ++i) {
+        std::string arg = argv[i];
+        if (arg == "--output" && i + 1 < argc) {
+            output_file = argv[++i];
+            output_specified = true;
+        } else if (arg == "--trim-start" || arg == "-s") {
+            trim_start_requested = true;
+        } else if (arg == "--trim-end" || arg == "-e") {
+            trim_end_requested = true;
+        } else if (arg == "--replace" || arg == "-i") {
+            output_specified = false;
+        } else if (arg == "--batch" && i + 1 < argc) {
+            batch_file = argv[++i];
+        } else if (arg == "--model" && i + 1 < argc) {
+            model_path = argv[++i];
+        } else if ((arg == "--threads" || arg == "-t") && i + 1 < argc) {
+            n_threads = std::max(1, atoi(argv[++i]));
+        } else if (arg == "--threshold" && i + 1 < argc) {
+            const char * value = argv[++i];
+            char * value_end = nullptr;
+            threshold = strtof(value, &value_end);
+            if (value_end == value || *value_end != '\0' || !(threshold >= 0.0f && threshold <= 1.0f)) {
+                fprintf(stderr, "Error: --threshold must be a number between 0 and 1, got %s\n", value);
+                return 1;
+            }
+        } else if (arg == "--gpu" || arg == "-g") {
+            use_gpu = true;
+        } else if (arg == "--gpu-device" && i + 1 < argc) {
+            use_gpu = true;
+            gpu_device = atoi(argv[++i]);
+        } else if (arg[0] != '-') {
+            if (audio_file.empty()) {
+                audio_file = arg;
+            } else {
+                fprintf(stderr, "Error: Multiple audio files specified: %s and %s\n", audio_file.c_str(), arg.c_str());
+                return 1;
+            }
+        } else {
+            fprintf(stderr, "Error: Unknown option %s\n", arg.c_str());
+            return 1;
+        }
+    }
+
+    if (audio_file.empty() && batch_file.empty()) {
+        fprintf(stderr, "Usage: %s <audio_file> [options]\n", argv[0]);
+        fprintf(stderr, "\nOptions:\n");
+        fprintf(stderr, "  --output <file>    Output file path (default: overwrites input file)\n");
+        fprintf(stderr, "  --trim-start, -s   Trim only the silence at the beginning\n");
+        fprintf(stderr, "  --trim-end, -e     Trim only the silence at the end\n");
+        fprintf(stderr, "  --batch <file>     Process every audio file listed (one per line) in <file>\n");
+        fprintf(stderr, "  --model <file>     Path to Silero VAD model\n");
+        fprintf(stderr, "  --threshold <p>    Speech probability threshold, e.g. lowered for quantized models (default: %.2f)\n", threshold);
+        fprintf(stderr, "  --threads, -t <n>  Number of threads used by the VAD (default: %d). Long inputs trimmed at\n", n_threads);
+        fprintf(stderr, "                     both ends are scanned from both ends at once by two scan threads\n");
+        fprintf(stderr, "                     that split the <n> VAD threads between them\n");
+        fprintf(stderr, "  --gpu, -g          Run the VAD on the GPU (worth it for long or batched inputs)\n");
+        fprintf(stderr, "  --gpu-device <n>   GPU device to use, implies --gpu (default: 0)\n");
+        return 1;
+    }
+
+    if (const char* env_model = getenv("WHISPER_VAD_MODEL")) {
+        model_path = env_model;
+    }
+
+    std::vector<std::string> audio_files;
+    if (!batch_file.empty()) {
+        if (!audio_file.empty() || output_specified) {
+            fprintf(stderr, "Error: --batch cannot be combined with an audio file or --output\n");
+            return 1;
+        }
+        std::ifstream batch(batch_file);
+        if (!batch) {
+            fprintf(stderr, "Error: Failed to open batch file %s\n", batch_file.c_str());
+            return 1;
+        }
+        for (std::string line; std::getline(batch, line);) {
+            if (!line.empty()) {
+                audio_files.push_back(line);
+            }
+        }
+    } else {
+        audio_files.push_back(audio_file);
+    }
+
+    bool call_trim_start = trim_start_requested || (!trim_start_requested && !trim_end_requested);
+    bool call_trim_end = trim_end_requested || (!trim_start_requested && !trim_end_requested);
+
+    // Initialize VAD context
+    struct whisper_vad_context_params vparams = whisper_vad_default_context_params();
+    vparams.n_threads = n_threads;
+    vparams.use_gpu = use_gpu;
+    vparams.gpu_device = gpu_device;
+
+    struct whisper_vad_context * vctx = whisper_vad_init_from_file_with_params(model_path.c_str(), vparams);
+    if (vctx == nullptr) {
+        fprintf(stderr, "Error: Failed to initialize VAD context using model from %s\n", model_path.c_str());
+        return 1;
+    }
+
+    // Contexts for scanning both ends concurrently, only loaded once a long input needs them
+    struct vad_scan_pair scan_pair;
+    scan_pair.vctx = vctx;
+    scan_pair.model_path = model_path;
+    scan_pair.vparams = vparams;
+
+    // Detect speech segments
+    struct whisper_vad_params vad_params = whisper_vad_default_params();
+    vad_params.threshold = threshold;
+
+    // The VAD model and the sample buffer are allocated once and reused for every file
+    std::vector<float> pcmf32;
+    int ret = 0;
+    for (const std::string & file : audio_files) {
+        if (process_file(vctx, scan_pair, vad_params, pcmf32, file, output_file, !output_specified, call_trim_start, call_trim_end) != 0) {
+            ret = 1;
+        }
+    }
+
+    vad_scan_pair_free(scan_pair);
+    whisper_vad_free(vctx);
+
+    return ret;
+}
@@ -37,6 +37,7 @@
 #ifdef WHISPER_FFMPEG
 // as implemented in ffmpeg_trancode.cpp only embedded in common lib if whisper built with ffmpeg support
 extern int ffmpeg_decode_audio(const std::string & ifname, std::vector<uint8_t> & wav_data);
+extern int ffmpeg_decode_audio_f32(const std::string & ifname, std::vector<float> & pcmf32);
 #endif
 
 bool read_audio_data(const std::string & fname, std::vector<float>& pcmf32, std::vector<std::vector<float>>& pcmf32s, bool stereo) {
@@ -74,6 +75,17 @@ bool read_audio_data(const std::string & fname, std::vector<float>& pcmf32, std:
     }
     else if (((result = ma_decoder_init_file(fname.c_str(), &decoder_config, &decoder)) != MA_SUCCESS)) {
 #if defined(WHISPER_FFMPEG)
+		// ffmpeg already resamples to 16khz mono, so mono callers take the float samples directly
+		if (!stereo) {
+			if (ffmpeg_decode_audio_f32(fname, pcmf32) != 0) {
+				fprintf(stderr, "error: failed to ffmpeg decode '%s'\n", fname.c_str());
+
+				return false;
+			}
+
+			return true;
+		}
+
 		if (ffmpeg_decode_audio(fname, audio_data) != 0) {
 			fprintf(stderr, "error: failed to ffmpeg decode '%s'\n", fname.c_str());
 
@@ -112,7 +124,9 @@ bool read_audio_data(const std::string & fname, std::vector<float>& pcmf32, std:
     }
 
     if (stereo) {
-        std::vector<float> stereo_data = pcmf32;
+        // take over the interleaved samples instead of copying them
+        std::vector<float> stereo_data;
+        stereo_data.swap(pcmf32);
         pcmf32.resize(frame_count);
 
         for (uint64_t i = 0; i < frame_count; i++) {
@@ -41,6 +41,11 @@ typedef int8_t    s8;
 
 #define WAVE_SAMPLE_RATE	16000
 #define AVIO_CTX_BUF_SZ		 4096
+/*
+ * Upper bound on decoded 16khz samples per byte of input: 32 samples/byte
+ * still covers a 4 kbit/s stream, far below any real speech codec setting.
+ */
+#define MAX_SAMPLES_PER_INPUT_BYTE	32
 
 static const char* ffmpegLog = getenv("FFMPEG_LOG");
 // Todo: add __FILE__ __LINE__
@@ -148,8 +153,14 @@ static int read_packet(void *opaque, u8 *buf, int buf_size)
 	return buf_size;
 }
 
+/* Output sample format matching the element type of the decoded data */
+template <typename T> struct sample_format;
+template <> struct sample_format<s16>   { static constexpr AVSampleFormat value = AV_SAMPLE_FMT_S16; };
+template <> struct sample_format<float> { static constexpr AVSampleFormat value = AV_SAMPLE_FMT_FLT; };
+
+template <typename T>
 static void convert_frame(struct SwrContext *swr, AVCodecContext *codec,
-			  AVFrame *frame, std::vector<s16> &data, bool flush)
+			  AVFrame *frame, std::vector<T> &data, bool flush)
 {
 	int nr_samples;
 	s64 delay;
@@ -161,7 +172,13 @@ static void convert_frame(struct SwrContext *swr, AVCodecContext *codec,
 				    AV_ROUND_UP);
     if (nr_samples <= 0) return;
 
-	av_samples_alloc(&buffer, NULL, 1, nr_samples, AV_SAMPLE_FMT_S16, 0);
+    /*
+     * Resample straight into the tail of the output vector instead of a
+     * per-frame scratch buffer, then shrink to what was actually produced.
+     */
+    size_t old_size = data.size();
+    data.resize(old_size + nr_samples);
+    buffer = (u8 *)(data.data() + old_size);
 
 	/*
 	 * !flush is used to check if we are flushing any remaining
@@ -171,12 +188,7 @@ static void convert_frame(struct SwrContext *swr, AVCodecContext *codec,
 				 !flush ? (const u8 **)frame->data : NULL,
 				 !flush ? frame->nb_samples : 0);
 
-    if (converted > 0) {
-        size_t old_size = data.size();
-        data.resize(old_size + converted);
-        memcpy(data.data() + old_size, buffer, converted * sizeof(s16));
-    }
-	av_freep(&buffer);
+    data.resize(old_size + (converted > 0 ? converted : 0));
 }
 
 static bool is_audio_stream(const AVStream *stream)
@@ -188,11 +200,12 @@ static bool is_audio_stream(const AVStream *stream)
 }
 
 // Return non zero on error, 0 on success
-// audio_buffer: input memory
-// data: decoded output audio data (vector of samples)
-static int decode_audio(struct audio_buffer *audio_buf, std::vector<s16> &data)
+// audio_buffer: input memory, or NULL to let libavformat read url itself
+// url: input file path, only used when audio_buf is NULL
+// data: decoded output audio data (vector of s16 or float samples)
+template <typename T>
+static int decode_audio(struct audio_buffer *audio_buf, const char *url, std::vector<T> &data)
 {
-    LOG("decode_audio: input size: %d\n", audio_buf->size);
 	AVFormatContext *fmt_ctx = NULL;
 	AVIOContext *avio_ctx = NULL;
 	AVCodecContext *codec = NULL;
@@ -205,14 +218,20 @@ static int decode_audio(struct audio_buffer *audio_buf, std::vector<s16> &data)
     const size_t errbuffsize = 1024;
     char errbuff[errbuffsize];
 
-    fmt_ctx = avformat_alloc_context();
-    avio_ctx_buffer = (u8*)av_malloc(AVIO_CTX_BUF_SZ);
-    LOG("Creating an avio context: AVIO_CTX_BUF_SZ=%d\n", AVIO_CTX_BUF_SZ);
-    avio_ctx = avio_alloc_context(avio_ctx_buffer, AVIO_CTX_BUF_SZ, 0, audio_buf, &read_packet, NULL, NULL);
-	fmt_ctx->pb = avio_ctx;
+    if (audio_buf) {
+        LOG("decode_audio: input size: %d\n", audio_buf->size);
+        fmt_ctx = avformat_alloc_context();
+        avio_ctx_buffer = (u8*)av_malloc(AVIO_CTX_BUF_SZ);
+        LOG("Creating an avio context: AVIO_CTX_BUF_SZ=%d\n", AVIO_CTX_BUF_SZ);
+        avio_ctx = avio_alloc_context(avio_ctx_buffer, AVIO_CTX_BUF_SZ, 0, audio_buf, &read_packet, NULL, NULL);
+        fmt_ctx->pb = avio_ctx;
+        url = NULL;
+    } else {
+        LOG("decode_audio: input file: %s\n", url);
+    }
 
     // open the input stream and read header
-	err = avformat_open_input(&fmt_ctx, NULL, NULL, NULL);
+	err = avformat_open_input(&fmt_ctx, url, NULL, NULL);
 	if (err) {
         LOG("Could not read audio buffer: %d: %s\n", err, av_make_error_string(errbuff, errbuffsize, err));
         return err;
@@ -271,7 +290,7 @@ static int decode_audio(struct audio_buffer *audio_buf, std::vector<s16> &data)
 	/* Convert it into 16khz Mono */
 	av_opt_set_chlayout(swr, "out_chlayout", &out_ch_layout, 0);
 	av_opt_set_int(swr, "out_sample_rate", WAVE_SAMPLE_RATE, 0);
-	av_opt_set_sample_fmt(swr, "out_sample_fmt", AV_SAMPLE_FMT_S16, 0);
+	av_opt_set_sample_fmt(swr, "out_sample_fmt", sample_format<T>::value, 0);
 #else
 	av_opt_set_int(swr, "in_channel_count", codec->channels, 0);
 	av_opt_set_int(swr, "out_channel_count", 1, 0);
@@ -280,11 +299,22 @@ static int decode_audio(struct audio_buffer *audio_buf, std::vector<s16> &data)
 	av_opt_set_int(swr, "in_sample_rate", codec->sample_rate, 0);
 	av_opt_set_int(swr, "out_sample_rate", WAVE_SAMPLE_RATE, 0);
 	av_opt_set_sample_fmt(swr, "in_sample_fmt", codec->sample_fmt, 0);
-	av_opt_set_sample_fmt(swr, "out_sample_fmt", AV_SAMPLE_FMT_S16, 0);
+	av_opt_set_sample_fmt(swr, "out_sample_fmt", sample_format<T>::value, 0);
 #endif
 
-	swr_init(swr);
-	if (!swr_is_initialized(swr)) {
+	/*
+	 * Prefer the soxr engine, which is both faster and higher quality
+	 * than the builtin one, when libswresample was built with libsoxr.
+	 * Checking the build configuration up front avoids swr_init logging
+	 * an error for an engine that is simply not there.
+	 */
+	if (strstr(swresample_configuration(), "--enable-libsoxr")) {
+		av_opt_set_int(swr, "resampler", SWR_ENGINE_SOXR, 0);
+	} else {
+		LOG("soxr resampler unavailable, using the builtin one\n");
+	}
+	err = swr_init(swr);
+	if (err < 0 || !swr_is_initialized(swr)) {
         LOG("Resampler has not been properly initialized\n");
         swr_free(&swr);
         avcodec_free_context(&codec);
@@ -297,7 +327,24 @@ static int decode_audio(struct audio_buffer *audio_buf, std::vector<s16> &data)
 
 	/* iterate through frames */
     data.clear();
-    data.reserve(audio_buf->size / 2); // heuristic
+    {
+        /*
+         * Size the output from the container duration so it never has to
+         * grow. The duration is only metadata, so it is trusted only while
+         * it stays within MAX_SAMPLES_PER_INPUT_BYTE of the input size;
+         * otherwise fall back to the old heuristic.
+         */
+        s64 in_size = audio_buf ? audio_buf->size : FFMAX(avio_size(fmt_ctx->pb), 0);
+        s64 estimate = -1;
+        if (fmt_ctx->duration != AV_NOPTS_VALUE && fmt_ctx->duration > 0) {
+            estimate = av_rescale_rnd(fmt_ctx->duration, WAVE_SAMPLE_RATE, AV_TIME_BASE, AV_ROUND_UP) + WAVE_SAMPLE_RATE;
+        }
+        if (estimate > 0 && estimate <= in_size * MAX_SAMPLES_PER_INPUT_BYTE) {
+            data.reserve(estimate);
+        } else {
+            data.reserve(in_size / 2); // heuristic
+        }
+    }
 	while (av_read_frame(fmt_ctx, packet) >= 0) {
         if (packet->stream_index == stream_index) {
 		    avcodec_send_packet(codec, packet);
@@ -325,12 +372,9 @@ static int decode_audio(struct audio_buffer *audio_buf, std::vector<s16> &data)
 	return 0;
 }
 
-// in mem decoding/conversion/resampling:
-// ifname: input file path
-// owav_data: in mem wav file. Can be forwarded as it to whisper/drwav
-// return 0 on success
-int ffmpeg_decode_audio(const std::string &ifname, std::vector<uint8_t>& owav_data) {
-    LOG("ffmpeg_decode_audio: %s\n", ifname.c_str());
+// Map the input file and decode it as 16khz mono into data
+template <typename T>
+static int decode_file(const std::string &ifname, std::vector<T> &data) {
     int ifd = open(ifname.c_str(), O_RDONLY);
     if (ifd == -1) {
         fprintf(stderr, "Couldn't open input file %s\n", ifname.c_str());
@@ -349,9 +393,7 @@ int ffmpeg_decode_audio(const std::string &ifname, std::vector<uint8_t>& owav_da
     inaudio_buf.ptr = ibuf;
     inaudio_buf.size = ibuf_size;
 
-    std::vector<s16> odata;
-
-    err = decode_audio(&inaudio_buf, odata);
+    err = decode_audio(&inaudio_buf, NULL, data);
     munmap(ibuf, ibuf_size);
     close(ifd);
 
@@ -360,7 +402,23 @@ int ffmpeg_decode_audio(const std::string &ifname, std::vector<uint8_t>& owav_da
         LOG("decode_audio failed\n");
         return err;
     }
-    LOG("decode_audio output samples: %zu\n", odata.size());
+    LOG("decode_audio output samples: %zu\n", data.size());
+
+    return 0;
+}
+
+// in mem decoding/conversion/resampling:
+// ifname: input file path
+// owav_data: in mem wav file. Can be forwarded as it to whisper/drwav
+// return 0 on success
+int ffmpeg_decode_audio(const std::string &ifname, std::vector<uint8_t>& owav_data) {
+    LOG("ffmpeg_decode_audio: %s\n", ifname.c_str());
+    std::vector<s16> odata;
+
+    int err = decode_file(ifname, odata);
+    if (err != 0) {
+        return err;
+    }
 
     wave_hdr wh;
     const size_t outdatasize = odata.size() * sizeof(s16);
@@ -373,3 +431,24 @@ int ffmpeg_decode_audio(const std::string &ifname, std::vector<uint8_t>& owav_da
 
     return 0;
 }
+
+// decoding/conversion/resampling straight to float samples, skipping the
+// intermediate wav file. The file is read through libavformat's own buffered
+// I/O rather than mapped whole, so large inputs are streamed.
+// ifname: input file path
+// pcmf32: 16khz mono samples
+// return 0 on success
+int ffmpeg_decode_audio_f32(const std::string &ifname, std::vector<float>& pcmf32) {
+    LOG("ffmpeg_decode_audio_f32: %s\n", ifname.c_str());
+    // the explicit file: protocol keeps names like "10:30.opus" from being
+    // parsed as a "10" protocol prefix
+    const std::string url = "file:" + ifname;
+    int err = decode_audio(NULL, url.c_str(), pcmf32);
+    if (err != 0) {
+        LOG("decode_audio failed\n");
+        return err;
+    }
+    LOG("decode_audio output samples: %zu\n", pcmf32.size());
+
+    return 0;
+}